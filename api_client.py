@@ -2,17 +2,54 @@
 import os
 import json
 import asyncio
-from typing import Any, Dict, Optional, List
+import functools
+from typing import Any, Dict, Optional, List, Set
 
 import aiohttp
 from aiohttp import ClientTimeout
 from aiohttp.client_exceptions import ClientError
 
+try:
+    import orjson
+except ImportError:  # optional speedup, falls back to stdlib json
+    orjson = None
+
 
 DEFAULT_API_URL = "https://lbf7-hackaton.replit.app/ask"
 
+# Static part of the request body; only query and chat_history are encoded per call
+_PAYLOAD_PREFIX = b'{"filters":[],"prefer_markdown":true,"citations":true,"max_tokens":0,"query":'
+
+
+def _json_dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
+
+
+def _json_loads(data: Any) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
 
+def _encode_payload(query_text: str, chat_history: Optional[List[Dict[str, str]]]) -> bytes:
+    body = _PAYLOAD_PREFIX + _json_dumps(query_text)
+    if chat_history:
+        body += b',"chat_history":' + _json_dumps(chat_history)
+    return body + b"}"
+
+
+@functools.lru_cache(maxsize=1)
+def _api_url() -> str:
+    # Read once, lazily, for the same .env ordering reason as _build_headers
+    return os.environ.get("API_URL", DEFAULT_API_URL)
+
+
+@functools.lru_cache(maxsize=1)
 def _build_headers() -> Dict[str, str]:
+    # Built lazily on first request (after .env is loaded) and shared afterwards;
+    # aiohttp copies headers per request, so the cached dict is never mutated
     headers: Dict[str, str] = {
         "User-Agent": "tg-bot",
         "Content-Type": "application/json",
@@ -48,39 +85,49 @@ def _build_headers() -> Dict[str, str]:
     return headers
 
 
+def create_session() -> aiohttp.ClientSession:
+    # One shared session per process so requests reuse pooled keep-alive connections
+    timeout = ClientTimeout(total=float(os.environ.get("API_TIMEOUT", "30")))
+    # Keep idle connections (and DNS) around across long gaps between messages
+    connector = aiohttp.TCPConnector(
+        limit=100,
+        limit_per_host=32,
+        ttl_dns_cache=600,
+        keepalive_timeout=300,
+    )
+    return aiohttp.ClientSession(timeout=timeout, connector=connector)
+
+
+async def warm_up(session: aiohttp.ClientSession) -> None:
+    # Open a pooled TCP+TLS connection ahead of the first question; failures are harmless
+    url = _api_url()
+    try:
+        async with session.head(url, timeout=ClientTimeout(total=5)):
+            pass
+    except (asyncio.TimeoutError, ClientError):
+        pass
+
+
 async def ask_api(
     query_text: str,
     *,
-    session: Optional[aiohttp.ClientSession] = None,
+    session: aiohttp.ClientSession,
     chat_history: Optional[List[Dict[str, str]]] = None,
 ) -> Dict[str, Any]:
-    url = os.environ.get("API_URL", DEFAULT_API_URL)
-    payload: Dict[str, Any] = {
-        "query": query_text,
-        "filters": [],
-        "prefer_markdown": True,
-        "citations": True,
-        "max_tokens": 0,
-    }
-    if chat_history:
-        payload["chat_history"] = chat_history
+    url = _api_url()
+    payload = _encode_payload(query_text, chat_history)
     headers = _build_headers()
 
-    owns_session = False
     resp_json: Dict[str, Any] = {}
     try:
-        if session is None:
-            timeout = ClientTimeout(total=float(os.environ.get("API_TIMEOUT", "30")))
-            session = aiohttp.ClientSession(timeout=timeout)
-            owns_session = True
-        async with session.post(url, data=json.dumps(payload).encode("utf-8"), headers=headers) as resp:
-            text = await resp.text()
+        async with session.post(url, data=payload, headers=headers) as resp:
             if resp.status >= 400:
+                data = await resp.read()
                 # Do not raise; return structured error for the caller to handle
                 try:
-                    body = json.loads(text)
-                except Exception:
-                    body = text
+                    body = _json_loads(data) if data else data
+                except ValueError:
+                    body = data
                 return {
                     "error": {
                         "status": resp.status,
@@ -88,22 +135,16 @@ async def ask_api(
                         "body": body,
                     }
                 }
-            content_type = resp.headers.get("Content-Type", "")
-            if "application/json" in content_type:
-                resp_json = await resp.json(content_type=None)
-            else:
-                # Try to parse anyway
-                try:
-                    resp_json = json.loads(text)
-                except Exception:
-                    resp_json = {"raw": text}
+            # Parse the raw bytes directly regardless of Content-Type
+            data = await resp.read()
+            try:
+                resp_json = _json_loads(data)
+            except ValueError:
+                resp_json = {"raw": data.decode("utf-8", "replace")}
     except asyncio.TimeoutError as e:
         return {"error": {"status": "timeout", "message": str(e)}}
     except ClientError as e:
         return {"error": {"status": "network", "message": str(e)}}
-    finally:
-        if owns_session and session is not None:
-            await session.close()
     return resp_json
 
 
@@ -123,6 +164,8 @@ def _extract_error_message(body: Any) -> Optional[str]:
             val = body.get(key)
             if isinstance(val, str) and val.strip():
                 return val.strip()
+    if isinstance(body, (bytes, bytearray)):
+        body = body.decode("utf-8", "replace")
     if isinstance(body, str) and body.strip():
         return body.strip()[:300]
     return None
@@ -147,32 +190,31 @@ def extract_source_titles(response_json: Dict[str, Any], *, max_titles: Optional
     if not isinstance(resources, dict):
         resources = {}
 
-    id_to_title: Dict[str, str] = {}
-    for resource_id, resource_obj in resources.items():
+    seen: Set[str] = set()
+
+    def _add_title(resource_obj: Any) -> bool:
+        # Returns True once max_titles is reached
         if isinstance(resource_obj, dict):
             title = resource_obj.get("title")
-            if isinstance(title, str) and title.strip():
-                id_to_title[resource_id] = title.strip()
-
-    # Prefer best_matches order
+            if isinstance(title, str):
+                title = title.strip()
+                if title and title not in seen:
+                    seen.add(title)
+                    titles.append(title)
+        return bool(max_titles) and len(titles) >= max_titles
+
+    # Prefer best_matches order, looking resources up by id
     best_matches = find_result.get("best_matches") or []
     if isinstance(best_matches, list):
         for match in best_matches:
             if not isinstance(match, str):
                 continue
-            resource_id = match.split("/")[0]
-            title = id_to_title.get(resource_id)
-            if title and title not in titles:
-                titles.append(title)
-                if max_titles and len(titles) >= max_titles:
-                    return titles
+            resource_id = match.partition("/")[0]
+            if _add_title(resources.get(resource_id)):
+                return titles
 
     # Fallback: include remaining titles
-    for _, title in id_to_title.items():
-        if title and title not in titles:
-            titles.append(title)
-            if max_titles and len(titles) >= max_titles:
-                break
+    for resource_obj in resources.values():
+        if _add_title(resource_obj):
+            break
     return titles
-
-
@@ -2,15 +2,22 @@
 import os
 import re
 import asyncio
+from collections import deque
 from typing import Final
 
 import dotenv
 from telegram import Update
 from telegram.constants import ChatAction, ParseMode
-from telegram.error import BadRequest
+from telegram.error import BadRequest, TelegramError
 from telegram.ext import Application, ContextTypes, MessageHandler, CommandHandler, filters
 
-from api_client import ask_api, extract_answer_text, extract_source_titles
+from api_client import (
+    ask_api,
+    create_session,
+    warm_up,
+    extract_answer_text,
+    extract_source_titles,
+)
 
 
 dotenv.load_dotenv()
@@ -22,69 +29,71 @@ BOT_TOKEN_ENV_VARS: Final = [
     "BOT_TOKEN",
 ]
 
+# Per-chat history keeps only the last N messages
+MAX_HISTORY_MESSAGES: Final = 20
+
 
 def _split_message(text: str, *, limit: int = 3900) -> list[str]:
-    # Splits text into chunks under Telegram limits, trying to break on paragraph boundaries
+    # Splits text into chunks under Telegram limits, trying to break on line boundaries
     if len(text) <= limit:
         return [text]
     parts: list[str] = []
-    current = []
-    current_len = 0
-    for line in text.split("\n"):
-        add_len = len(line) + (1 if current else 0)
-        if current_len + add_len > limit:
-            parts.append("\n".join(current))
-            current = [line]
-            current_len = len(line)
+    start = 0
+    text_len = len(text)
+    while start < text_len:
+        # Skip blank lines at a chunk boundary so a paragraph break never forces a hard split
+        if text[start] == "\n":
+            start += 1
+            continue
+        end = start + limit
+        if end >= text_len:
+            parts.append(text[start:])
+            break
+        # Break on the last newline that keeps the chunk within the limit (the newline is dropped)
+        cut = text.rfind("\n", start, end + 1)
+        if cut > start:
+            parts.append(text[start:cut])
+            start = cut + 1
         else:
-            if current:
-                current.append(line)
-                current_len += add_len
-            else:
-                current = [line]
-                current_len = len(line)
-    if current:
-        parts.append("\n".join(current))
+            # No usable newline: hard split so no chunk exceeds the limit
+            parts.append(text[start:end])
+            start = end
     return parts
 
 
+# Minimal escaping for Telegram Markdown (v1): only _, *, [, ], (, ), `
+_MD_V1_ESCAPE_TABLE: Final = str.maketrans({ch: "\\" + ch for ch in "_*[]()`"})
+# Telegram MarkdownV2 requires escaping: _ * [ ] ( ) ~ ` > # + - = | { } . !
+_MD_V2_ESCAPE_TABLE: Final = str.maketrans({ch: "\\" + ch for ch in "_[]()~`>#+-=|{}.!*"})
+
+
 def _escape_markdown_v1(text: str) -> str:
-    # Minimal escaping for Telegram Markdown (v1): only _, *, [, ], (, ), `
-    specials = set(["_", "*", "[", "]", "(", ")", "`"])
-    result_chars = []
-    for ch in text:
-        if ch in specials:
-            result_chars.append("\\" + ch)
-        else:
-            result_chars.append(ch)
-    return "".join(result_chars)
+    return text.translate(_MD_V1_ESCAPE_TABLE)
 
 
 def _escape_markdown_v2(text: str) -> str:
-    # Telegram MarkdownV2 requires escaping: _ * [ ] ( ) ~ ` > # + - = | { } . !
-    specials = set(list("_[]()~`>#+-=|{}.!*"))
-    out = []
-    for ch in text:
-        if ch in specials:
-            out.append("\\" + ch)
-        else:
-            out.append(ch)
-    return "".join(out)
+    return text.translate(_MD_V2_ESCAPE_TABLE)
 
 
 _CODE_SNIPPET_RE = re.compile(r"(```.*?```|`[^`]*`)", flags=re.DOTALL)
+_LIST_RE = re.compile(r"(?m)^(\s*)\* +")
+_BOLD_RE = re.compile(r"\*\*(.+?)\*\*")
+_UND_RE = re.compile(r"__(.+?)__")
 
 
 def _normalize_markdown_for_telegram(text: str) -> str:
     """Convert common Markdown constructs into Telegram-friendly Markdown (v1)."""
+    # Fast path: nothing to rewrite ('* ' covers every '*' list marker)
+    if "**" not in text and "__" not in text and "* " not in text:
+        return text
 
     def _normalize_segment(segment: str) -> str:
         # Normalize list markers that use '*' to '-' to avoid conflicts with bold
-        segment = re.sub(r"(?m)^(\s*)\* +", r"\1- ", segment)
+        segment = _LIST_RE.sub(r"\1- ", segment)
         # Convert double emphasis to single-star bold
-        segment = re.sub(r"\*\*(.+?)\*\*", r"*\1*", segment)
+        segment = _BOLD_RE.sub(r"*\1*", segment)
         # Convert double underscores to single underscore emphasis
-        segment = re.sub(r"__(.+?)__", r"_\1_", segment)
+        segment = _UND_RE.sub(r"_\1_", segment)
         return segment
 
     parts: list[str] = []
@@ -119,17 +128,34 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
 async def new_chat(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     # Reset chat history for this chat
-    context.chat_data["history"] = []
+    context.chat_data["history"] = deque(maxlen=MAX_HISTORY_MESSAGES)
     await update.message.reply_text("Starting a new conversation. How can I help?")
 
 
 async def _typing_indicator(bot, chat_id: int) -> None:
-    # Periodically sends ChatAction.TYPING until the task is cancelled
+    # Periodically sends ChatAction.TYPING until the task is cancelled.
+    # Runs alongside the API call; typing status is best-effort, so Bot API
+    # errors are ignored rather than surfacing when the task is awaited.
     while True:
-        await bot.send_chat_action(chat_id=chat_id, action=ChatAction.TYPING)
+        try:
+            await bot.send_chat_action(chat_id=chat_id, action=ChatAction.TYPING)
+        except TelegramError:
+            pass
         await asyncio.sleep(4)
 
 
+async def _reply_chunk(message, chunk: str) -> None:
+    # Send original Markdown (v1) to preserve formatting from API
+    try:
+        await message.reply_text(
+            chunk,
+            parse_mode=ParseMode.MARKDOWN,
+            disable_web_page_preview=True,
+        )
+    except BadRequest:
+        await message.reply_text(chunk)
+
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if not update.message or not update.message.text:
         return
@@ -140,14 +166,19 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     chat_id = update.effective_chat.id
     typing_task = asyncio.create_task(_typing_indicator(context.bot, chat_id))
     try:
-        # Maintain per-chat history: list of {role, content}
+        # Maintain per-chat history: bounded deque of {role, content}
         history = context.chat_data.get("history")
-        if not isinstance(history, list):
-            history = []
+        if not isinstance(history, deque):
+            history = deque(history or [], maxlen=MAX_HISTORY_MESSAGES)
+            context.chat_data["history"] = history
 
         history.append({"role": "user", "content": user_text})
 
-        resp = await ask_api(user_text, chat_history=history)
+        resp = await ask_api(
+            user_text,
+            session=context.bot_data["http_session"],
+            chat_history=list(history),
+        )
         if isinstance(resp, dict) and resp.get("error"):
             # Show a friendly message without technical details
             await update.message.reply_text(
@@ -158,37 +189,24 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         answer = extract_answer_text(resp)
         if not answer:
             answer = "Sorry, I couldn't find an answer. Please try rephrasing your question."
+        # History keeps the raw API text; sources and Telegram markdown are presentation only
+        raw_answer = answer
 
         # Append sources if available (with safe Markdown)
         titles = extract_source_titles(resp, max_titles=5)
         if titles:
-            sources_block_lines = ["", "", "*Sources:*"]
-            for title in titles:
-                safe_title = _escape_markdown_v1(title)
-                sources_block_lines.append(f"- {safe_title}")
-            answer = answer + "\n".join(sources_block_lines)
+            sources_block = "\n".join(f"- {_escape_markdown_v1(title)}" for title in titles)
+            answer = f"{answer}\n\n*Sources:*\n{sources_block}"
 
         normalized_answer = _normalize_markdown_for_telegram(answer)
 
-        # Telegram limits message length; split if too long
-        # Send original Markdown (v1) to preserve formatting from API
+        # Telegram limits message length; split if too long.
+        # Chunks are sent one at a time so they arrive in order
         for chunk in _split_message(normalized_answer, limit=3900):
-            try:
-                await update.message.reply_text(
-                    chunk,
-                    parse_mode=ParseMode.MARKDOWN,
-                    disable_web_page_preview=True,
-                )
-            except BadRequest:
-                await update.message.reply_text(chunk)
-
-        # Save assistant reply to history (truncate long chats)
-        history.append({"role": "assistant", "content": normalized_answer[:4000]})
-        # Keep last N turns
-        max_messages = 20
-        if len(history) > max_messages:
-            history = history[-max_messages:]
-        context.chat_data["history"] = history
+            await _reply_chunk(update.message, chunk)
+
+        # Save assistant reply to history (truncate long replies)
+        history.append({"role": "assistant", "content": raw_answer[:4000]})
     except Exception as exc:
         # Generic friendly fallback
         await update.message.reply_text(
@@ -202,12 +220,35 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             pass
 
 
+async def _startup(app: Application) -> None:
+    # Shared HTTP session for the API so every message reuses pooled connections
+    session = create_session()
+    app.bot_data["http_session"] = session
+    # Warm the pool in the background so polling starts without waiting on the API
+    app.bot_data["warm_up_task"] = asyncio.create_task(warm_up(session))
+
+
+async def _shutdown(app: Application) -> None:
+    warm_up_task = app.bot_data.pop("warm_up_task", None)
+    if warm_up_task is not None and not warm_up_task.done():
+        warm_up_task.cancel()
+        try:
+            await warm_up_task
+        except asyncio.CancelledError:
+            pass
+    session = app.bot_data.pop("http_session", None)
+    if session is not None:
+        await session.close()
+
+
 def main() -> None:
     token = _get_bot_token()
     app = (
         Application.builder()
         .token(token)
         .concurrent_updates(True)
+        .post_init(_startup)
+        .post_shutdown(_shutdown)
         .build()
     )
 